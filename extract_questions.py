@@ -8,10 +8,38 @@ GitHub: https://github.com/347870660/HTML-Question-Extractor
 """
 
 import re
+import html
 import os
 import sys
-import glob
-from bs4 import BeautifulSoup
+import mmap
+import codecs
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup, SoupStrainer
+
+# 优先使用C实现的lxml解析器，未安装时回退到内置的html.parser
+try:
+    import lxml
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# 预编译正则表达式，避免每道题重复编译
+RE_ANSWER_ID = re.compile(r'^answer\d+$')
+RE_ANSWER_CLASS = re.compile(r'ans-|answer')
+RE_CHOICE_CLASS = re.compile(r'choice\d+')
+RE_HTML_TAG = re.compile(r'<[^>]+>')
+RE_QUESTION_CLASS = re.compile(r'(?:^|\s)questionLi(?:\s|$)')
+
+# 只构建题目元素的子树，跳过页面中其余的脚本、样式等内容
+# 过滤时class属性尚未拆分为列表，需按空白分隔匹配
+QUESTION_STRAINER = SoupStrainer('div', class_=RE_QUESTION_CLASS)
+
+# 提取结果缓存目录，内容未变化的文件再次运行时直接读取缓存
+CACHE_DIR = '.cache'
+# 缓存格式版本，修改任何提取逻辑或结果结构时都需要递增，使旧缓存失效
+CACHE_FORMAT = 1
 
 class QuestionExtractor:
     """HTML题目提取器"""
@@ -22,55 +50,84 @@ class QuestionExtractor:
         self.contact = "QQ: 347870660"
         self.github_url = "https://github.com/347870660/HTML-Question-Extractor"
     
-    def extract_questions(self, html_content):
+    def extract_questions(self, html_content, errors=None):
         """
         从HTML内容中提取所有题目
         
         Args:
-            html_content (str): HTML内容
+            html_content (str | bytes | mmap): HTML内容，非文本内容按UTF-8解码
+            errors (list): 收集解析警告的列表，为None时直接打印
             
         Returns:
             list: 题目列表
+            
+        Raises:
+            UnicodeDecodeError: 非文本内容不是有效的UTF-8编码
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
+        # 字节内容交给解析器按UTF-8解码
+        from_encoding = None
+        if not isinstance(html_content, str):
+            # 解析器遇到无效字节会静默替换，需先严格校验编码
+            self._check_utf8(html_content)
+            from_encoding = 'utf-8'
+        soup = BeautifulSoup(html_content, HTML_PARSER,
+                             parse_only=QUESTION_STRAINER, from_encoding=from_encoding)
         
-        # 查找所有题目元素
-        question_elements = soup.find_all('div', class_='questionLi')
+        # 解析结果只包含题目元素，直接遍历顶层子节点
+        question_elements = [child for child in soup.children if child.name == 'div']
         
         results = []
+        parse_errors = []
         
         for question_element in question_elements:
-            try:
-                # 提取题目信息
-                question_data = self._parse_question_element(question_element)
-                if question_data:
-                    results.append(question_data)
-            except Exception as e:
-                print(f"警告: 解析题目时出错 - {str(e)}")
+            # 没有题目标题的元素不是有效题目，直接跳过
+            question_title = question_element.find('h3', class_='mark_name')
+            if question_title is None:
                 continue
+            
+            # 提取题目信息
+            question_data = self._parse_question_element(question_element, question_title, parse_errors)
+            if question_data:
+                results.append(question_data)
+        
+        for error in parse_errors:
+            message = f"警告: 解析题目时出错 - {error}"
+            if errors is None:
+                print(message)
+            else:
+                errors.append(message)
         
         return results
     
-    def _parse_question_element(self, question_element):
-        """解析单个题目元素"""
+    def _check_utf8(self, html_bytes, chunk_size=1 << 20):
+        """分块严格解码字节内容，不是有效的UTF-8时抛出UnicodeDecodeError"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for start in range(0, len(html_bytes), chunk_size):
+            decoder.decode(html_bytes[start:start + chunk_size])
+        decoder.decode(b'', final=True)
+    
+    def _parse_question_element(self, question_element, question_title, errors):
+        """解析单个题目元素，出错时将错误信息追加到errors并返回None"""
         # 提取题目ID
         question_id = question_element.get('data', '')
         
-        # 提取题目文本
-        question_title = question_element.find('h3', class_='mark_name')
-        if not question_title:
-            return None
-            
-        question_text = self._extract_question_text(question_title)
-        
-        # 判断题目类型
+        # 判断题目类型（需在提取题目文本之前，后者会移除类型标签）
         question_type = self._detect_question_type(question_title)
         
-        # 提取答案
-        answer = self._extract_answer(question_element)
+        # 提取题目文本
+        question_text = self._extract_question_text(question_title)
         
-        # 提取选项
-        options = self._extract_options(question_element, question_type)
+        # 答案和选项的结构因题型而异，只在这一部分捕获异常
+        is_choice = "单选题" in question_type or "选择题" in question_type
+        try:
+            # 提取答案
+            answer = self._extract_answer(question_element)
+            
+            # 提取选项（仅选择类题目）
+            options = self._extract_options(question_element) if is_choice else []
+        except Exception as e:
+            errors.append(str(e))
+            return None
         
         return {
             'id': question_id,
@@ -78,16 +135,15 @@ class QuestionExtractor:
             'question': question_text,
             'answer': answer,
             'options': options,
-            'is_multiple_choice': len(options) > 0
+            'is_multiple_choice': bool(options)
         }
     
     def _extract_question_text(self, question_title):
-        """提取题目文本"""
-        question_text = ''
-        for content in question_title.contents:
-            if content.name != 'span' and content.string:
-                question_text += content.string.strip()
-        return question_text
+        """提取题目文本（包括嵌套在其他标签中的文本）"""
+        # 移除直接子级的span（题型、分值等标签）后一次性取出全部文本
+        for span in question_title.find_all('span', recursive=False):
+            span.extract()
+        return question_title.get_text(strip=True)
     
     def _detect_question_type(self, question_title):
         """检测题目类型"""
@@ -102,7 +158,7 @@ class QuestionExtractor:
         answer = ""
         
         # 方式1：查找隐藏的答案输入框（单选题）
-        answer_input = question_element.find('input', id=re.compile(r'^answer\d+$'))
+        answer_input = question_element.find('input', id=RE_ANSWER_ID)
         if answer_input:
             answer = answer_input.get('value', '')
         
@@ -110,113 +166,234 @@ class QuestionExtractor:
         if not answer:
             textarea = question_element.find('textarea')
             if textarea:
-                answer = textarea.get_text(strip=True)
+                # textarea内容按原始文本解析，其中的标签需要单独清理
+                answer = self._clean_html_tags(textarea.get_text(strip=True))
         
-        # 方式3：查找已填写的答案（主观题）
+        # 方式3：查找已填写的答案（主观题），直接由解析器提取纯文本
         if not answer:
-            answer_div = question_element.find('div', class_=re.compile(r'ans-|answer'))
+            answer_div = question_element.find('div', class_=RE_ANSWER_CLASS)
             if answer_div:
                 answer = answer_div.get_text(strip=True)
         
         return answer
     
-    def _extract_options(self, question_element, question_type):
+    def _extract_options(self, question_element):
         """提取选项"""
         options = []
-        if "单选题" in question_type or "选择题" in question_type:
-            option_elements = question_element.find_all('div', class_='answerBg')
-            for option_element in option_elements:
-                option_span = option_element.find('span', class_=re.compile(r'choice\d+'))
-                option_text_div = option_element.find('div', class_='answer_p')
-                
-                if option_span and option_text_div:
-                    option_letter = option_span.get_text(strip=True)
-                    option_content = option_text_div.get_text(strip=True)
-                    options.append(f"{option_letter}. {option_content}")
+        option_elements = question_element.find_all('div', class_='answerBg')
+        for option_element in option_elements:
+            option_span, option_text_div = self._find_option_parts(option_element)
+            
+            if option_span and option_text_div:
+                option_letter = option_span.get_text(strip=True)
+                option_content = option_text_div.get_text(strip=True)
+                options.append(f"{option_letter}. {option_content}")
         return options
     
-    def save_questions(self, results, output_filename):
+    def _find_option_parts(self, option_element):
+        """一次遍历选项的直接子节点，找出选项字母和选项内容"""
+        option_span = None
+        option_text_div = None
+        for child in option_element.children:
+            if child.name == 'span' and option_span is None:
+                if any(RE_CHOICE_CLASS.search(c) for c in child.get('class', ())):
+                    option_span = child
+            elif child.name == 'div' and option_text_div is None:
+                if 'answer_p' in child.get('class', ()):
+                    option_text_div = child
+        
+        # 结构不符合预期时回退到递归查找
+        if option_span is None:
+            option_span = option_element.find('span', class_=RE_CHOICE_CLASS)
+        if option_text_div is None:
+            option_text_div = option_element.find('div', class_='answer_p')
+        return option_span, option_text_div
+    
+    def save_questions(self, results, output_filename, errors=None):
         """
         保存题目到文件
         
         Args:
             results (list): 题目列表
             output_filename (str): 输出文件名
+            errors (list): 收集错误信息的列表，为None时直接打印
+            
+        Returns:
+            tuple: 保存成功时返回 (选择题数, 主观题数)，失败时返回None
         """
+        # 一次遍历将题目分为选择题和主观题
+        multiple_choice = []
+        subjective = []
+        for q in results:
+            if q['is_multiple_choice']:
+                multiple_choice.append(q)
+            else:
+                subjective.append(q)
+        
+        # 整个文件的内容先拼接为片段列表，最后一次性编码写入
+        parts = []
+        self._write_file_header(parts, multiple_choice, subjective)
+        self._save_multiple_choice_questions(parts, multiple_choice)
+        self._save_subjective_questions(parts, subjective)
+        
         try:
             with open(output_filename, 'w', encoding='utf-8') as f:
-                # 写入文件头
-                self._write_file_header(f, results)
-                
-                # 保存选择题
-                self._save_multiple_choice_questions(f, results)
-                
-                # 保存主观题
-                self._save_subjective_questions(f, results)
-                
-            return True
+                f.write("".join(parts))
+            return len(multiple_choice), len(subjective)
         except Exception as e:
-            print(f"保存文件时出错: {str(e)}")
-            return False
+            message = f"保存文件时出错: {str(e)}"
+            if errors is None:
+                print(message)
+            else:
+                errors.append(message)
+            return None
     
-    def _write_file_header(self, file_obj, results):
+    def _write_file_header(self, parts, multiple_choice, subjective):
         """写入文件头"""
-        multiple_choice_count = sum(1 for q in results if q['is_multiple_choice'])
-        subjective_count = len(results) - multiple_choice_count
+        multiple_choice_count = len(multiple_choice)
+        subjective_count = len(subjective)
         
-        file_obj.write("=" * 60 + "\n")
-        file_obj.write("HTML题目提取结果\n")
-        file_obj.write("=" * 60 + "\n")
-        file_obj.write(f"工具: HTML Question Extractor v{self.version}\n")
-        file_obj.write(f"作者: {self.author}\n")
-        file_obj.write(f"联系: {self.contact}\n")
-        file_obj.write(f"GitHub: {self.github_url}\n")
-        file_obj.write(f"总题数: {len(results)}题\n")
-        file_obj.write(f"选择题: {multiple_choice_count}题\n")
-        file_obj.write(f"主观题: {subjective_count}题\n")
-        file_obj.write("=" * 60 + "\n\n")
+        parts.extend([
+            "=" * 60 + "\n",
+            "HTML题目提取结果\n",
+            "=" * 60 + "\n",
+            f"工具: HTML Question Extractor v{self.version}\n",
+            f"作者: {self.author}\n",
+            f"联系: {self.contact}\n",
+            f"GitHub: {self.github_url}\n",
+            f"总题数: {multiple_choice_count + subjective_count}题\n",
+            f"选择题: {multiple_choice_count}题\n",
+            f"主观题: {subjective_count}题\n",
+            "=" * 60 + "\n\n",
+        ])
     
-    def _save_multiple_choice_questions(self, file_obj, results):
+    def _save_multiple_choice_questions(self, parts, multiple_choice):
         """保存选择题"""
-        multiple_choice = [q for q in results if q['is_multiple_choice']]
         if multiple_choice:
-            file_obj.write("【选择题】\n")
-            file_obj.write("-" * 50 + "\n")
+            parts.append("【选择题】\n")
+            parts.append("-" * 50 + "\n")
             for i, result in enumerate(multiple_choice, 1):
-                file_obj.write(f"{i}. {result['question']}\n")
+                parts.append(f"{i}. {result['question']}\n")
                 for option in result['options']:
-                    file_obj.write(f"   {option}\n")
-                file_obj.write(f"   答案: {result['answer']}\n\n")
+                    parts.append(f"   {option}\n")
+                parts.append(f"   答案: {result['answer']}\n\n")
     
-    def _save_subjective_questions(self, file_obj, results):
+    def _save_subjective_questions(self, parts, subjective):
         """保存主观题"""
-        subjective = [q for q in results if not q['is_multiple_choice']]
         if subjective:
-            file_obj.write("\n【主观题】\n")
-            file_obj.write("-" * 50 + "\n")
+            parts.append("\n【主观题】\n")
+            parts.append("-" * 50 + "\n")
             for i, result in enumerate(subjective, 1):
-                file_obj.write(f"{i}. {result['question']}\n")
+                parts.append(f"{i}. {result['question']}\n")
                 if result['answer'] and result['answer'].strip():
-                    clean_answer = self._clean_html_tags(result['answer'])
-                    file_obj.write(f"   参考答案: {clean_answer}\n")
-                file_obj.write("\n")
+                    parts.append(f"   参考答案: {result['answer']}\n")
+                parts.append("\n")
     
     def _clean_html_tags(self, text):
         """清理HTML标签"""
-        clean_text = re.sub(r'<[^>]+>', '', text)
-        clean_text = clean_text.replace('&quot;', '"')
-        clean_text = clean_text.replace('&nbsp;', ' ')
-        return clean_text
+        if '<' in text:
+            text = RE_HTML_TAG.sub('', text)
+        if '&' in text:
+            text = html.unescape(text)
+        return text.replace('\xa0', ' ')
 
 def check_dependencies():
     """检查依赖库"""
     try:
         from bs4 import BeautifulSoup
-        return True
     except ImportError:
         print("错误: 缺少必要的依赖库")
         print("请安装 BeautifulSoup4: pip install beautifulsoup4")
         return False
+    
+    try:
+        import lxml
+    except ImportError:
+        print("提示: 未安装 lxml，将使用较慢的 html.parser 解析器")
+        print("推荐安装 lxml 以加快解析速度: pip install lxml")
+    return True
+
+def get_cache_key(html_bytes, version):
+    """根据文件内容、工具版本、缓存格式和解析器计算缓存键"""
+    sha1 = hashlib.sha1(f"{version}:{CACHE_FORMAT}:{HTML_PARSER}:".encode('utf-8'))
+    sha1.update(html_bytes)
+    return sha1.hexdigest()
+
+def load_cached_results(cache_key):
+    """读取缓存的提取结果，缓存不存在或已损坏时返回None"""
+    cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json")
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+    except Exception:
+        return None
+    return results if isinstance(results, list) else None
+
+def save_cached_results(cache_key, results):
+    """保存提取结果到缓存，失败时忽略"""
+    cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json")
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False)
+        # 先写临时文件再替换，避免并行进程读到写了一半的缓存
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+
+def process_one_file(html_file):
+    """
+    处理单个HTML文件（在子进程中运行）
+    
+    Args:
+        html_file (str): HTML文件名
+        
+    Returns:
+        tuple: (输出文件名, 选择题数, 主观题数, 提示信息列表)，失败时输出文件名为None
+    """
+    extractor = QuestionExtractor()
+    # 子进程中不直接打印，提示信息交由主进程按文件输出
+    messages = []
+    try:
+        # 以内存映射方式读取文件并提取题目
+        with open(html_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                results = []
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # 不含题目标记的文件无需解析
+                    if mm.find(b'questionLi') < 0:
+                        results = []
+                    else:
+                        cache_key = get_cache_key(mm, extractor.version)
+                        results = load_cached_results(cache_key)
+                        if results is None:
+                            results = extractor.extract_questions(mm, messages)
+                            save_cached_results(cache_key, results)
+        
+        if not results:
+            messages.append(f"⚠️  未找到题目: {html_file}")
+            return None, 0, 0, messages
+        
+        # 生成输出文件
+        base_name = os.path.splitext(html_file)[0]
+        output_file = f"{base_name}.txt"
+        
+        # 保存题目
+        counts = extractor.save_questions(results, output_file, messages)
+        if counts is None:
+            messages.append("❌ 失败: 保存文件出错")
+            return None, 0, 0, messages
+        
+        multiple_choice, subjective = counts
+        return output_file, multiple_choice, subjective, messages
+    
+    except UnicodeDecodeError:
+        messages.append("❌ 编码错误: 请检查文件编码是否为UTF-8")
+    except Exception as e:
+        messages.append(f"❌ 错误: {str(e)}")
+    return None, 0, 0, messages
 
 def process_files():
     """处理文件"""
@@ -233,8 +410,15 @@ def process_files():
     print(f"GitHub: {extractor.github_url}")
     print("=" * 60)
     
-    # 检查HTML文件
-    html_files = glob.glob("*.html")
+    # 检查HTML文件，按文件大小从大到小排列，让耗时最长的文件最先开始处理
+    with os.scandir('.') as entries:
+        html_entries = [
+            entry for entry in entries
+            if os.path.normcase(entry.name).endswith('.html')
+            and not entry.name.startswith('.') and entry.is_file()
+        ]
+    html_entries.sort(key=lambda entry: entry.stat().st_size, reverse=True)
+    html_files = [entry.name for entry in html_entries]
     if not html_files:
         print("当前目录下没有找到HTML文件！")
         print("请将HTML文件放在脚本同一目录下。")
@@ -248,41 +432,20 @@ def process_files():
     input("\n按回车键开始处理...")
     print("\n开始处理文件...")
     
-    # 处理每个文件
+    # 处理每个文件，各文件相互独立，交给多个进程并行处理
     success_count = 0
-    for html_file in html_files:
-        try:
+    with ProcessPoolExecutor() as executor:
+        for html_file, (output_file, multiple_choice, subjective, messages) in zip(
+                html_files, executor.map(process_one_file, html_files)):
             print(f"\n处理中: {html_file}")
-            
-            # 读取文件
-            with open(html_file, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-            
-            # 提取题目
-            results = extractor.extract_questions(html_content)
-            
-            if not results:
-                print(f"  ⚠️  未找到题目: {html_file}")
+            for message in messages:
+                print(f"  {message}")
+            if output_file is None:
                 continue
             
-            # 生成输出文件
-            base_name = os.path.splitext(html_file)[0]
-            output_file = f"{base_name}.txt"
-            
-            # 保存题目
-            if extractor.save_questions(results, output_file):
-                multiple_choice = sum(1 for q in results if q['is_multiple_choice'])
-                subjective = len(results) - multiple_choice
-                print(f"  ✅ 成功: {output_file} (共{len(results)}题)")
-                print(f"     选择题: {multiple_choice}题, 主观题: {subjective}题")
-                success_count += 1
-            else:
-                print(f"  ❌ 失败: 保存文件出错")
-                
-        except UnicodeDecodeError:
-            print(f"  ❌ 编码错误: 请检查文件编码是否为UTF-8")
-        except Exception as e:
-            print(f"  ❌ 错误: {str(e)}")
+            print(f"  ✅ 成功: {output_file} (共{multiple_choice + subjective}题)")
+            print(f"     选择题: {multiple_choice}题, 主观题: {subjective}题")
+            success_count += 1
     
     # 显示结果
     print("\n" + "=" * 60)